@@ -1,7 +1,21 @@
 """
 Entry point script to run the Solana Token Analysis API.
+
+Serves with WEB_CONCURRENCY worker processes, one per CPU by default. Set
+RELOAD=true for local development to run a single auto-reloading worker
+instead.
 """
+import os
+
 import uvicorn
 
 if __name__ == "__main__":
-    uvicorn.run("src.solana_token_api.main:app", host="0.0.0.0", port=8000, reload=True)
+    reload = os.getenv("RELOAD", "false").lower() == "true"
+    workers = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+    uvicorn.run(
+        "src.solana_token_api.main:app",
+        host="0.0.0.0",
+        port=8000,
+        reload=reload,
+        workers=None if reload else workers,
+    )
@@ -1,3 +1,9 @@
 """Solana Token Analysis API."""
 
+import os
+
+# Single-row XGBoost predictions finish faster than an OpenMP pool starts up,
+# so run inference single-threaded (must be set before xgboost is imported)
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+
 __version__ = "1.0.0"
@@ -1,14 +1,16 @@
 import argparse
-import json
 import logging
 import os
 import sys
-from datetime import datetime
+from itertools import islice
 from pathlib import Path
 
+import orjson
+import pandas as pd
 from dotenv import load_dotenv
 
-from solana_token_api.models.database import SessionLocal, TokenData, init_db
+from solana_token_api.models.database import SessionLocal, init_db
+from solana_token_api.utils.database_utils import insert_token_rows
 from solana_token_api.utils.logger import setup_logger
 
 # Get the absolute path to the root of the project
@@ -22,6 +24,12 @@ sys.path.insert(0, str(project_root / "src"))
 assets_dir = project_root / "src" / "solana_token_api" / "assets"
 assets_dir.mkdir(exist_ok=True)
 
+# Rows per bulk insert call when loading seed data
+INSERT_BATCH_SIZE = 10_000
+
+# Data files with these extensions hold one JSON record per line
+NDJSON_SUFFIXES = {".ndjson", ".jsonl"}
+
 
 def parse_args():
     """Parse command line arguments"""
@@ -32,7 +40,10 @@ def parse_args():
         "--data-file",
         type=str,
         default=str(project_root / "data" / "ohlcv_data.json"),
-        help="Path to the JSON data file to load (default: data/ohlcv_data.json)",
+        help=(
+            "Path to the JSON data file to load (default: data/ohlcv_data.json); "
+            ".ndjson/.jsonl files are streamed, JSON arrays are read in full"
+        ),
     )
     parser.add_argument(
         "--recreate-db",
@@ -42,8 +53,70 @@ def parse_args():
     return parser.parse_args()
 
 
+def iter_records(data_path):
+    """Yield raw records from a JSON array or a line-delimited JSON file"""
+    with open(data_path, "rb") as f:
+        if data_path.suffix in NDJSON_SUFFIXES:
+            # One record per line, so only the current batch is held in memory
+            for line in f:
+                if line.strip():
+                    yield orjson.loads(line)
+        else:
+            yield from orjson.loads(f.read())
+
+
+def build_mappings(batch, logger):
+    """Validate a batch of raw records and convert them to TokenData mappings"""
+    # Parse all dates up front; unparseable values become NaT
+    day_strs = [(item.get("date") or "").split("T")[0] for item in batch]
+    dates = pd.to_datetime(day_strs, format="%Y-%m-%d", errors="coerce")
+    created_ats = pd.to_datetime(
+        [item.get("created_at", day_str) for item, day_str in zip(batch, day_strs)],
+        format="%Y-%m-%d",
+        errors="coerce",
+    )
+
+    mappings = []
+    for item, date_ts, created_ts in zip(batch, dates, created_ats):
+        mint_address = item.get("mint_address")
+        date_str = item.get("date")
+
+        if not mint_address or not date_str:
+            logger.warning("Skipping record with missing mint_address or date")
+            continue
+
+        if date_ts is pd.NaT:
+            logger.warning(f"Skipping record with invalid date: {date_str}")
+            continue
+
+        if created_ts is pd.NaT:
+            logger.warning(
+                f"Skipping record with invalid created_at: {item.get('created_at')}"
+            )
+            continue
+
+        try:
+            mappings.append(
+                {
+                    "id": f"{mint_address}_{date_str}",
+                    "mint_address": mint_address,
+                    "date": date_ts.date(),
+                    "open": float(item.get("open", 0)),
+                    "high": float(item.get("high", 0)),
+                    "low": float(item.get("low", 0)),
+                    "close": float(item.get("close", 0)),
+                    "volume": float(item.get("volume", 0)),
+                    "created_at": created_ts.date(),
+                }
+            )
+        except Exception as e:
+            logger.warning(f"Error processing record: {str(e)}")
+
+    return mappings
+
+
 def load_existing_data(data_file, logger):
-    """Load token data from a JSON file"""
+    """Load token data from a JSON or line-delimited JSON file"""
     data_path = Path(data_file)
     if not data_path.exists():
         logger.error(f"File {data_file} not found")
@@ -63,64 +136,28 @@ def load_existing_data(data_file, logger):
 
     logger.info(f"Loading data from {data_path}")
 
-    try:
-        with open(data_path, "r") as f:
-            data = json.load(f)
-    except json.JSONDecodeError:
-        logger.error(f"Failed to parse {data_path} as JSON")
-        return 0
-    except Exception as e:
-        logger.error(f"Error reading {data_path}: {str(e)}")
-        return 0
-
     # Create database session
     db = SessionLocal()
 
     try:
+        # Parse, validate and insert one batch of records at a time
         count = 0
-        for item in data:
-            mint_address = item.get("mint_address")
-            date_str = item.get("date")
-
-            if not mint_address or not date_str:
-                logger.warning("Skipping record with missing mint_address or date")
-                continue
-
-            try:
-                date_obj = datetime.strptime(date_str.split("T")[0], "%Y-%m-%d").date()
-            except ValueError:
-                logger.warning(f"Skipping record with invalid date: {date_str}")
-                continue
-
-            # Check if record already exists
-            record_id = f"{mint_address}_{date_str}"
-            existing = db.query(TokenData).filter_by(id=record_id).first()
-
-            if not existing:
-                # Create new record
-                try:
-                    db_record = TokenData(
-                        id=record_id,
-                        mint_address=mint_address,
-                        date=date_obj,
-                        open=float(item.get("open", 0)),
-                        high=float(item.get("high", 0)),
-                        low=float(item.get("low", 0)),
-                        close=float(item.get("close", 0)),
-                        volume=float(item.get("volume", 0)),
-                        created_at=datetime.strptime(
-                            item.get("created_at", date_str.split("T")[0]), "%Y-%m-%d"
-                        ).date(),
-                    )
-                    db.add(db_record)
-                    count += 1
-                except Exception as e:
-                    logger.warning(f"Error processing record: {str(e)}")
-
+        records = iter_records(data_path)
+        while batch := list(islice(records, INSERT_BATCH_SIZE)):
+            count += insert_token_rows(db, build_mappings(batch, logger))
         db.commit()
+
         logger.info(f"Successfully loaded {count} records")
         return count
 
+    except orjson.JSONDecodeError:
+        logger.error(f"Failed to parse {data_path} as JSON")
+        db.rollback()
+        return 0
+    except OSError as e:
+        logger.error(f"Error reading {data_path}: {str(e)}")
+        db.rollback()
+        return 0
     except Exception as e:
         logger.error(f"Error during database import: {str(e)}")
         db.rollback()
@@ -155,7 +192,7 @@ if __name__ == "__main__":
 
     # Initialize the database
     logger.info("Initializing database")
-    init_db()
+    init_db(recreate=args.recreate_db)
     logger.info("Database initialized successfully")
 
     # Verify the database was created
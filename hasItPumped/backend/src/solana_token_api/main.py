@@ -6,51 +6,92 @@ Main application module with FastAPI endpoints.
 
 import logging
 import os
-from datetime import datetime, timezone
-from typing import List
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
 
-import pandas as pd
+import numpy as np
 import xgboost as xgb
+from cachetools import TTLCache
 from fastapi import BackgroundTasks, Depends, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from slowapi.util import get_remote_address
+from sqlalchemy import Connection, Row, func, select
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 # Local imports
-from solana_token_api.models.database import TokenData, get_db
+from solana_token_api.models.database import TokenData, get_conn, get_db, migrate_db
 from solana_token_api.models.schema import (
     DatabaseStats,
     PoolResponse,
-    TokenDataPoint,
     TokenRequest,
     TokenResponse,
     TokenSummary,
 )
-from solana_token_api.utils.data_fetcher import get_solana_dex_trade_data
+from solana_token_api.utils.data_fetcher import close_client, get_solana_dex_trade_data
 from solana_token_api.utils.database_utils import (
     get_latest_tokens,
+    get_token_counts,
+    insert_token_rows,
     update_token_predictions,
 )
 from solana_token_api.utils.feature_engineering import engineer_features
 from solana_token_api.utils.logger import setup_logger
-from solana_token_api.utils.model_utils import load_model, make_prediction
+from solana_token_api.utils.model_utils import (
+    load_compiled_predictor,
+    load_model,
+    make_prediction,
+)
+from solana_token_api.utils.prediction_batcher import PredictionBatcher
 
 limiter = Limiter(key_func=get_remote_address)
 
 # Configure application logging
 logger = setup_logger("api")
 
+# Days of price history used for analysis, and fetched on first back-fill
+HISTORY_DAYS = 300
+
 # Load the XGBoost model
 model = load_model()
+booster = model.get_booster()
+
+# Prefer the natively compiled model, falling back to XGBoost if it isn't built
+predict_batch = load_compiled_predictor() or booster.inplace_predict
+
+# Score concurrent /analyze_token requests together
+batcher = PredictionBatcher(predict_batch)
+
+# (is_pre_peak, confidence) returned when the model fails to score a token
+DEFAULT_PREDICTION = (True, 0.5)
+
+# (is_pre_peak, confidence) keyed by (mint_address, latest date of data)
+prediction_cache: TTLCache = TTLCache(maxsize=4096, ttl=3600)
+
+# Rendered /analyze_token responses keyed by (mint_address, UTC day), so
+# repeat requests skip the database and BitQuery entirely
+response_cache: TTLCache = TTLCache(maxsize=1024, ttl=300)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Migrate stored data on startup; release the BitQuery client on shutdown"""
+    await run_in_threadpool(migrate_db)
+    yield
+    await close_client()
+
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Solana Token Analysis API",
     description="API for analyzing Solana token price data and determining pre/post peak status",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
 
 app.state.limiter = limiter
@@ -75,23 +116,16 @@ def read_root(request: Request):
 
 @app.get("/stats", response_model=DatabaseStats)
 @limiter.limit("20/minute")
-def get_stats(request: Request, db: Session = Depends(get_db)):
+def get_stats(request: Request, conn: Connection = Depends(get_conn)):
     """Get overall statistics of the database"""
     logger.info("Fetching database statistics")
 
-    # Get latest token data
-    latest_tokens = get_latest_tokens(db)
-
-    # Count tokens
-    total_tokens = len(latest_tokens)
-
-    # Count pre/post peak
-    pre_peak_count = sum(1 for token in latest_tokens if token.is_pre_peak is True)
-    post_peak_count = sum(1 for token in latest_tokens if token.is_pre_peak is False)
+    # Count tokens and pre/post peak in the database
+    total_tokens, pre_peak_count, post_peak_count = get_token_counts(conn)
 
     # Get 10 most recent tokens
     recent_tokens = []
-    for token in latest_tokens[:10]:
+    for token in get_latest_tokens(conn, limit=10):
         recent_tokens.append(
             TokenSummary(
                 mint_address=token.mint_address,
@@ -115,32 +149,141 @@ def get_stats(request: Request, db: Session = Depends(get_db)):
     )
 
 
-@app.post("/analyze_token", response_model=TokenResponse)
-@limiter.limit("20/minute")
-async def analyze_token(
-    request: Request,
-    token_request: TokenRequest,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
-):
-    """Analyze token price data and determine if it's pre or post peak"""
-    mint_address = token_request.mint_address
-    logger.info(f"Analyzing token: {mint_address}")
-
-    # Get existing data
-    existing_rows = (
-        db.query(TokenData)
-        .filter(TokenData.mint_address == mint_address)
+def load_price_history(db: Session, mint_address: str) -> Sequence[Row]:
+    """Read a token's stored daily prices, newest first."""
+    return db.execute(
+        select(
+            TokenData.date,
+            TokenData.open,
+            TokenData.high,
+            TokenData.low,
+            TokenData.close,
+            TokenData.volume,
+        )
+        .where(TokenData.mint_address == mint_address)
         .order_by(TokenData.date.desc())
-        .all()
-    )
+        .limit(HISTORY_DAYS)
+    ).all()
+
+
+def load_earlier_history(
+    db: Session, mint_address: str, before: date
+) -> Tuple[int, Optional[float]]:
+    """
+    Summarize a token's stored days older than the loaded price history.
+
+    Args:
+        db: SQLAlchemy session
+        mint_address: Token mint address
+        before: Oldest date returned by load_price_history
+
+    Returns:
+        Tuple of (number of older days, highest high among them)
+    """
+    days, high = db.execute(
+        select(func.count(), func.max(TokenData.high)).where(
+            TokenData.mint_address == mint_address, TokenData.date < before
+        )
+    ).one()
+    return days, high
+
+
+def store_fetched_days(
+    db: Session, mint_address: str, rows: List[Dict], existing_rows: Sequence[Row]
+) -> List[Dict]:
+    """
+    Store the BitQuery days that aren't already in the database.
+
+    Args:
+        db: SQLAlchemy session
+        mint_address: Token mint address
+        rows: DEXTradeByTokens entries from BitQuery
+        existing_rows: Stored history from load_price_history
+
+    Returns:
+        List of dicts with ISO date, open, high, low, close, volume for the
+        newly stored days
+    """
+    today_utc = datetime.now(timezone.utc).date()
+
+    # Days already stored are merged in from existing_rows by the caller
+    stored_dates = {r.date for r in existing_rows}
+
+    # Parse every day's date in one call
+    dates = np.array(
+        [day["Block"]["Timefield"][:10] for day in rows],
+        dtype="datetime64[D]",
+    ).tolist()
+
+    token_data = []
+    new_records = []
+    for day, date_only in zip(rows, dates):
+        date_str = day["Block"]["Timefield"]
+
+        # Skip if already present
+        if date_only in stored_dates:
+            continue
+        stored_dates.add(date_only)
+
+        # BitQuery may return aggregates as strings
+        prices = {
+            "open": float(day["Trade"]["open"]),
+            "high": float(day["Trade"]["high"]),
+            "low": float(day["Trade"]["low"]),
+            "close": float(day["Trade"]["close"]),
+            "volume": float(day["volume"]),
+        }
+
+        new_records.append(
+            {
+                "id": f"{mint_address}_{date_str}",
+                "mint_address": mint_address,
+                "date": date_only,
+                **prices,
+                "created_at": today_utc,
+            }
+        )
+        token_data.append({"date": date_str, **prices})
+
+    insert_token_rows(db, new_records)
+    db.commit()
+    return token_data
+
+
+async def collect_token_data(
+    db: Session, mint_address: str
+) -> Tuple[List[Dict], int, Optional[float]]:
+    """
+    Gather a token's daily prices, fetching and storing any missing days.
+
+    Database work blocks, so it runs in the threadpool; the BitQuery request
+    is awaited on the event loop.
+
+    Args:
+        db: SQLAlchemy session
+        mint_address: Token mint address
+
+    Returns:
+        Tuple of (list of dicts with ISO date, open, high, low, close, volume,
+        newest day first; number of stored days older than those; highest
+        high among the older days)
+    """
+    existing_rows = await run_in_threadpool(load_price_history, db, mint_address)
+
+    # Only the latest HISTORY_DAYS are loaded, but the model's day count and
+    # all-time high still cover the token's full stored history
+    earlier_days, earlier_high = 0, None
+    if len(existing_rows) == HISTORY_DAYS:
+        earlier_days, earlier_high = await run_in_threadpool(
+            load_earlier_history, db, mint_address, existing_rows[-1].date
+        )
     latest_local_date = existing_rows[0].date if existing_rows else None
     earliest_local_date = existing_rows[-1].date if existing_rows else None
     today_utc = datetime.now(timezone.utc).date()
 
     # Calculate missing days
     if latest_local_date is None:
-        missing_days = 300  # First-time back-fill
+        missing_days = HISTORY_DAYS  # First-time back-fill
         existing_days = 0
     else:
         missing_days = max(0, (today_utc - latest_local_date).days - 1)
@@ -150,7 +293,9 @@ async def analyze_token(
     if missing_days > 0:
         logger.info(f"Fetching last {missing_days} day(s) for {mint_address}")
         try:
-            api_data = get_solana_dex_trade_data(mint_address, limit_days=missing_days)
+            api_data = await get_solana_dex_trade_data(
+                mint_address, limit_days=missing_days
+            )
 
             # Process API response
             rows = api_data["data"]["Solana"]["DEXTradeByTokens"]
@@ -160,42 +305,9 @@ async def analyze_token(
             if existing_days + len(rows) <= 3:
                 raise IndexError("Not enough data (minimum 3 days required)")
 
-            for day in rows:
-                date_str = day["Block"]["Timefield"]
-                pk = f"{mint_address}_{date_str}"
-
-                # Skip if already present (id is UNIQUE)
-                exists = db.query(TokenData.id).filter_by(id=pk).scalar()
-                if exists:
-                    continue
-
-                date_only = datetime.strptime(date_str[:10], "%Y-%m-%d").date()
-                db.add(
-                    TokenData(
-                        id=pk,
-                        mint_address=mint_address,
-                        date=date_only,
-                        open=day["Trade"]["open"],
-                        high=day["Trade"]["high"],
-                        low=day["Trade"]["low"],
-                        close=day["Trade"]["close"],
-                        volume=day["volume"],
-                        created_at=today_utc,
-                    )
-                )
-
-                token_data.append(
-                    {
-                        "date": date_str,
-                        "open": day["Trade"]["open"],
-                        "high": day["Trade"]["high"],
-                        "low": day["Trade"]["low"],
-                        "close": day["Trade"]["close"],
-                        "volume": day["volume"],
-                    }
-                )
-
-            db.commit()
+            token_data = await run_in_threadpool(
+                store_fetched_days, db, mint_address, rows, existing_rows
+            )
         except Exception as e:
             logger.error(f"Error fetching data: {str(e)}")
             raise HTTPException(
@@ -221,48 +333,84 @@ async def analyze_token(
     # Keep newest→oldest order
     token_data.sort(key=lambda x: x["date"], reverse=True)
 
+    return token_data, earlier_days, earlier_high
+
+
+@app.post("/analyze_token", response_model=TokenResponse)
+@limiter.limit("20/minute")
+async def analyze_token(
+    request: Request,
+    token_request: TokenRequest,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+):
+    """Analyze token price data and determine if it's pre or post peak"""
+    mint_address = token_request.mint_address
+    logger.info(f"Analyzing token: {mint_address}")
+
+    response_key = (mint_address, datetime.now(timezone.utc).date())
+    cached_response = response_cache.get(response_key)
+    if cached_response is not None:
+        logger.info(f"Using cached analysis for {mint_address}")
+        return Response(content=cached_response, media_type="application/json")
+
+    token_data, earlier_days, earlier_high = await collect_token_data(db, mint_address)
+
     # Check if we have enough data
     if len(token_data) < 3:
         raise HTTPException(
             status_code=400, detail="Not enough data (minimum 3 days required)"
         )
 
-    # Create DataFrame for model input
-    df = pd.DataFrame(token_data)
-    df_processed = engineer_features(df)
+    # The prediction only changes when a newer day of data arrives
+    cache_key = (mint_address, token_data[0]["date"][:10])
+    prediction = prediction_cache.get(cache_key)
 
-    # Make prediction
-    is_pre_peak, confidence = make_prediction(model, df_processed)
+    if prediction is not None:
+        logger.info(f"Using cached prediction for {mint_address}")
+    else:
+        # Build the feature matrix for model input
+        X = engineer_features(
+            token_data,
+            last_only=True,
+            earlier_days=earlier_days,
+            earlier_high=earlier_high,
+        )
+
+        # Make prediction
+        prediction = await make_prediction(batcher, X)
+
+        if prediction is not None:
+            prediction_cache[cache_key] = prediction
 
-    # Schedule background task to update database with prediction
-    background_tasks.add_task(
-        update_token_predictions,
-        db_session=db,
-        mint_address=mint_address,
-        df=df_processed,
-        is_pre_peak=is_pre_peak,
+            # Schedule background task to update database with prediction
+            background_tasks.add_task(
+                update_token_predictions,
+                db_session=db,
+                mint_address=mint_address,
+                is_pre_peak=prediction[0],
+            )
+
+    # If the model failed, answer with the default rather than failing the
+    # request, but leave it out of both caches so the next request retries
+    is_pre_peak, confidence = (
+        prediction if prediction is not None else DEFAULT_PREDICTION
     )
 
-    # Format response
-    response_data = [
-        TokenDataPoint(
-            date=item["date"],
-            open=item["open"],
-            high=item["high"],
-            low=item["low"],
-            close=item["close"],
-            volume=item["volume"],
-        )
-        for item in token_data
-    ]
-
-    return TokenResponse(
-        mint_address=mint_address,
-        data=response_data,
-        is_pre_peak=is_pre_peak,
-        confidence=float(confidence),
-        days_of_data=len(token_data),
+    # token_data already holds plain JSON-ready values, so return it directly
+    # rather than re-validating every data point through the response model
+    response = ORJSONResponse(
+        content={
+            "mint_address": mint_address,
+            "data": token_data,
+            "is_pre_peak": bool(is_pre_peak),
+            "confidence": float(confidence),
+            "days_of_data": len(token_data),
+        }
     )
+    if prediction is not None:
+        response_cache[response_key] = response.body
+    return response
 
 
 # For running the app directly
@@ -2,13 +2,30 @@
 Database models and connection setup for the Solana Token Analysis API.
 """
 
+import logging
 import os
+from datetime import date
 from pathlib import Path
 
 from dotenv import load_dotenv
-from sqlalchemy import Boolean, Column, Date, Float, String, create_engine
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Connection,
+    Date,
+    Float,
+    Index,
+    Integer,
+    String,
+    TypeDecorator,
+    create_engine,
+    event,
+    inspect,
+    text,
+)
 from sqlalchemy.orm import DeclarativeBase, sessionmaker
-from sqlalchemy.pool import NullPool
+
+logger = logging.getLogger("api.database")
 
 # Load environment variables
 load_dotenv()
@@ -37,11 +54,35 @@ if DATABASE_URL.startswith("postgresql"):
         DATABASE_URL,
         connect_args=connect_args,
         client_encoding="utf8",
-        poolclass=NullPool,
+        # Reuse connections across requests instead of reconnecting each time.
+        # The pool is per worker process, so the server can hold up to
+        # workers x (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections
+        pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "5")),
+        pool_pre_ping=True,
+        pool_recycle=1800,
+        # Batch executemany inserts into multi-row VALUES pages, and UPDATEs
+        # through psycopg2's execute_batch
+        executemany_mode="values_plus_batch",
+        insertmanyvalues_page_size=1000,
     )
 else:
     engine = create_engine(DATABASE_URL, connect_args=connect_args)
 
+if DATABASE_URL.startswith("sqlite"):
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragma(dbapi_connection, connection_record):
+        """Use WAL so readers don't block the writer and skip per-commit fsyncs"""
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        # 64 MB page cache and in-memory temp tables for sorts and windows
+        cursor.execute("PRAGMA cache_size=-64000")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+
+
 # Create database session
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -50,38 +91,123 @@ class Base(DeclarativeBase):
     pass
 
 
+class OrdinalDate(TypeDecorator):
+    """
+    Date column stored as an INTEGER day ordinal on SQLite.
+
+    SQLite has no native date type, so DATE values would otherwise be kept as
+    ISO strings and compared as text. Other databases keep their native DATE.
+    ISO strings left by databases created before this type are still read.
+    """
+
+    impl = Date
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "sqlite":
+            return dialect.type_descriptor(Integer())
+        return dialect.type_descriptor(Date())
+
+    def process_bind_param(self, value, dialect):
+        if value is not None and dialect.name == "sqlite":
+            return value.toordinal()
+        return value
+
+    def process_result_value(self, value, dialect):
+        if value is not None and dialect.name == "sqlite":
+            if isinstance(value, str):
+                return date.fromisoformat(value[:10])
+            return date.fromordinal(value)
+        return value
+
+
 class TokenData(Base):
     """SQLAlchemy model for token price data"""
 
     __tablename__ = "token_data"
+    __table_args__ = (
+        # Serves both "filter by mint" and "filter by mint, order by date" lookups
+        Index("ix_token_mint_date", "mint_address", "date"),
+    )
 
     id = Column(String, primary_key=True)  # composite key: mint_address + date
-    mint_address = Column(String, index=True)
-    date = Column(Date, index=True)
+    mint_address = Column(String)
+    date = Column(OrdinalDate, index=True)
     open = Column(Float)
     high = Column(Float)
     low = Column(Float)
     close = Column(Float)
     volume = Column(Float)
-    created_at = Column(Date)
+    created_at = Column(OrdinalDate)
     is_pre_peak = Column(
         Boolean, nullable=True
     )  # True for pre_peak, False for post_peak
 
 
-def init_db():
-    """Initialize the database tables"""
+# Matches the latest-row-per-token window (partition by mint, newest first)
+Index(
+    "ix_token_mint_created_date",
+    TokenData.mint_address,
+    TokenData.created_at.desc(),
+    TokenData.date.desc(),
+)
+
+
+def migrate_sqlite_dates(conn: Connection):
+    """Convert ISO string dates from older SQLite databases to day ordinals"""
+    # SQLite sorts every TEXT value above every INTEGER, so legacy rows would
+    # otherwise always look newer than the ordinals written since
+    if conn.dialect.name != "sqlite" or not inspect(conn).has_table("token_data"):
+        return
+
+    # julianday('0001-01-01') is 1721425.5 and date(1, 1, 1).toordinal() is 1
+    for column in ("date", "created_at"):
+        result = conn.execute(
+            text(
+                f"UPDATE token_data "
+                f"SET {column} = CAST(julianday({column}) - 1721424.5 AS INTEGER) "
+                f"WHERE typeof({column}) = 'text'"
+            )
+        )
+        if result.rowcount:
+            logger.info(f"Converted {result.rowcount} {column} values to ordinals")
+
+
+def migrate_db():
+    """Bring data stored by older versions up to the current storage format"""
+    with engine.begin() as conn:
+        migrate_sqlite_dates(conn)
+
+
+def init_db(recreate: bool = False):
+    """
+    Initialize the database tables.
+
+    Args:
+        recreate: Drop all existing tables first
+    """
     # Ensure the directory exists
     os.makedirs(os.path.dirname(db_path), exist_ok=True)
 
+    if recreate:
+        logger.warning("Dropping all database tables")
+        Base.metadata.drop_all(bind=engine)
+
     # Create all tables
     Base.metadata.create_all(bind=engine)
 
+    migrate_db()
+
+    # Add any indexes missing from tables created by an older schema
+    for index in Base.metadata.tables[TokenData.__tablename__].indexes:
+        index.create(bind=engine, checkfirst=True)
+
     # Verify the file was created
-    if os.path.exists(db_path):
-        print(f"Database file created at: {db_path}")
-    else:
-        print(f"WARNING: Database file not created at: {db_path}")
+    if DATABASE_URL.startswith("sqlite"):
+        if os.path.exists(db_path):
+            logger.debug(f"Database file created at: {db_path}")
+        else:
+            logger.warning(f"Database file not created at: {db_path}")
 
 
 def get_db():
@@ -91,3 +217,9 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def get_conn():
+    """Dependency to get a plain DB connection for read-only endpoints"""
+    with engine.connect() as conn:
+        yield conn
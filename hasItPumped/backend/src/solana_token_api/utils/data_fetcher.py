@@ -4,14 +4,62 @@ Utility functions for fetching data from external APIs.
 
 import logging
 import os
+from datetime import datetime, timezone
 
-import requests
+import httpx
+import orjson
+from cachetools import LRUCache
 from fastapi import HTTPException
 
 logger = logging.getLogger("api.data_fetcher")
 
+# Daily OHLCV for a token pair; the query text never changes, only its variables
+DEX_TRADE_QUERY = """
+query ($token: String!, $quote: String!, $limit: Int!) {
+    Solana(dataset: archive) {
+        DEXTradeByTokens(
+        orderBy: { descendingByField: "Block_Timefield" }
+        where: {
+            Trade: {
+            Currency: { MintAddress: { is: $token } }
+            Side:     { Currency: { MintAddress: { is: $quote } } }
+            PriceAsymmetry: { lt: 0.1 }
+            }
+        }
+        limit: { count: $limit }
+        ) {
+        Block {
+            Timefield: Time(interval: { in: days, count: 1 })
+        }
+        volume: sum(of: Trade_Amount)
+        Trade {
+            high:  Price(maximum: Trade_Price)
+            low:   Price(minimum: Trade_Price)
+            open:  Price(minimum: Block_Slot)
+            close: Price(maximum: Block_Slot)
+        }
+        count
+        }
+    }
+}
+"""
+
+# Reuse TLS connections to BitQuery across requests
+client = httpx.AsyncClient(
+    timeout=30, limits=httpx.Limits(max_connections=32, max_keepalive_connections=8)
+)
+
+
+async def close_client():
+    """Close the pooled BitQuery connections, on application shutdown"""
+    await client.aclose()
+
 
-def get_solana_dex_trade_data(
+# Responses keyed by (token, limit_days, quote currency, UTC date)
+dex_trade_cache: LRUCache = LRUCache(maxsize=1024)
+
+
+async def get_solana_dex_trade_data(
     token_address: str,
     limit_days: int = 300,
     quote_currency_address: str = "So11111111111111111111111111111111111111112",
@@ -19,6 +67,10 @@ def get_solana_dex_trade_data(
     """
     Fetch historical OHLCV for a Solana token pair from BitQuery
 
+    Daily candles only change when the UTC date rolls over, so responses are
+    cached per process for the current UTC date. The returned dict is shared
+    between callers and must not be mutated.
+
     Args:
         token_address: Mint address of the token
         limit_days: Number of days of data to fetch
@@ -30,6 +82,22 @@ def get_solana_dex_trade_data(
     Raises:
         HTTPException: If API call fails or returns an error
     """
+    utc_date = datetime.now(timezone.utc).date().isoformat()
+    cache_key = (token_address, limit_days, quote_currency_address, utc_date)
+    data = dex_trade_cache.get(cache_key)
+    if data is None:
+        # Failed requests raise and are therefore not cached
+        data = await fetch_dex_trade_data(
+            token_address, limit_days, quote_currency_address
+        )
+        dex_trade_cache[cache_key] = data
+    return data
+
+
+async def fetch_dex_trade_data(
+    token_address: str, limit_days: int, quote_currency_address: str
+):
+    """Fetch OHLCV from BitQuery without caching."""
 
     # Get API key from environment
     access_token = os.getenv("BITQUERY_ACCESS_TOKEN")
@@ -39,36 +107,6 @@ def get_solana_dex_trade_data(
 
     url = "https://streaming.bitquery.io/eap"
 
-    query = f"""
-    {{
-        Solana(dataset: archive) {{
-            DEXTradeByTokens(
-            orderBy: {{ descendingByField: "Block_Timefield" }}
-            where: {{
-                Trade: {{
-                Currency: {{ MintAddress: {{ is: "{token_address}" }} }}
-                Side:     {{ Currency: {{ MintAddress: {{ is: "{quote_currency_address}" }} }} }}
-                PriceAsymmetry: {{ lt: 0.1 }}
-                }}
-            }}
-            limit: {{ count: {limit_days} }}
-            ) {{
-            Block {{
-                Timefield: Time(interval: {{ in: days, count: 1 }})
-            }}
-            volume: sum(of: Trade_Amount)
-            Trade {{
-                high:  Price(maximum: Trade_Price)
-                low:   Price(minimum: Trade_Price)
-                open:  Price(minimum: Block_Slot)
-                close: Price(maximum: Block_Slot)
-            }}
-            count
-            }}
-        }}
-    }}
-    """
-
     headers = {
         "Content-Type": "application/json",
         "Authorization": f"Bearer {access_token}",
@@ -76,9 +114,17 @@ def get_solana_dex_trade_data(
 
     try:
         logger.debug(f"Sending request to BitQuery for token {token_address}")
-        resp = requests.post(url, json={"query": query}, headers=headers)
+        payload = {
+            "query": DEX_TRADE_QUERY,
+            "variables": {
+                "token": token_address,
+                "quote": quote_currency_address,
+                "limit": limit_days,
+            },
+        }
+        resp = await client.post(url, content=orjson.dumps(payload), headers=headers)
         resp.raise_for_status()
-        data = resp.json()
+        data = orjson.loads(resp.content)
 
         if "errors" in data:
             logger.error(f"GraphQL errors: {data['errors']}")
@@ -89,6 +135,6 @@ def get_solana_dex_trade_data(
         logger.debug(f"Successfully fetched data for token {token_address}")
         return data
 
-    except requests.RequestException as e:
+    except (httpx.HTTPError, orjson.JSONDecodeError) as e:
         logger.error(f"Request failed: {e}")
         raise HTTPException(status_code=503, detail=f"Failed to fetch data: {str(e)}")
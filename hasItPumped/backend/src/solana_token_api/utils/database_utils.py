@@ -3,98 +3,173 @@ Utility functions for database operations.
 """
 
 import logging
-from typing import List
-
-import pandas as pd
-from sqlalchemy import func
+from datetime import date
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import (
+    Connection,
+    Insert,
+    Row,
+    and_,
+    bindparam,
+    case,
+    func,
+    select,
+    update,
+)
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
 
 from solana_token_api.models.database import TokenData
-from solana_token_api.models.schema import LatestTokenStats
 
 logger = logging.getLogger("api.database_utils")
 
 
-def get_latest_tokens(db: Session) -> List[LatestTokenStats]:
+def _latest_per_token_subquery(dialect_name: str):
+    """Select the summary columns of each token's most recent row."""
+    newest_first = [TokenData.created_at.desc(), TokenData.date.desc()]
+    columns = (
+        TokenData.mint_address,
+        TokenData.created_at,
+        TokenData.is_pre_peak,
+        TokenData.close,
+        TokenData.volume,
+    )
+
+    if dialect_name == "postgresql":
+        # DISTINCT ON keeps each token's first row in ix_token_mint_created_date
+        # order, with no window to materialize
+        return (
+            select(*columns)
+            .distinct(TokenData.mint_address)
+            .order_by(TokenData.mint_address, *newest_first)
+            .subquery()
+        )
+
+    # Without DISTINCT ON, rank rows newest-first in the same index order
+    ranked = select(
+        *columns,
+        func.row_number()
+        .over(partition_by=TokenData.mint_address, order_by=newest_first)
+        .label("rn"),
+    ).subquery()
+    return select(ranked).where(ranked.c.rn == 1).subquery()
+
+
+def get_latest_tokens(conn: Connection, limit: Optional[int] = None) -> Sequence[Row]:
     """
     Get the most recent record for each token in the database.
 
     Args:
-        db: SQLAlchemy session
+        conn: SQLAlchemy connection
+        limit: Maximum number of tokens to return (most recently updated first)
 
     Returns:
-        List of TokenData objects, one per token
+        Rows with the token's latest summary columns and days_of_data
     """
-    # Create a subquery to get the latest row per token
-    latest_per_token_sq = db.query(
-        TokenData.id,
-        func.row_number()
-        .over(
-            partition_by=TokenData.mint_address,
-            order_by=[TokenData.created_at.desc(), TokenData.date.desc()],
-        )
-        .label("rn"),
-        func.count(TokenData.id)
-        .over(partition_by=TokenData.mint_address)
-        .label("days_of_data"),
-    ).subquery()
+    latest = _latest_per_token_subquery(conn.dialect.name)
 
-    # Join back to fetch the full rows, keeping rn = 1 only
-    result = (
-        db.query(TokenData, latest_per_token_sq.c.days_of_data)
-        .join(latest_per_token_sq, TokenData.id == latest_per_token_sq.c.id)
-        .filter(latest_per_token_sq.c.rn == 1)
-        .order_by(TokenData.created_at.desc())
-        .all()
+    # Only count the stored days of the tokens actually returned
+    days_of_data = (
+        select(func.count(TokenData.id))
+        .where(TokenData.mint_address == latest.c.mint_address)
+        .scalar_subquery()
     )
 
-    latest_tokens = []
-    for token, days_of_data in result:
-        setattr(token, "days_of_data", days_of_data)
-        latest_tokens.append(token)
+    query = select(
+        latest.c.mint_address,
+        latest.c.created_at,
+        latest.c.is_pre_peak,
+        latest.c.close,
+        latest.c.volume,
+        days_of_data.label("days_of_data"),
+    ).order_by(latest.c.created_at.desc())
+    if limit is not None:
+        query = query.limit(limit)
+    latest_tokens = conn.execute(query).all()
 
     logger.debug(f"Found {len(latest_tokens)} unique tokens in database")
 
     return latest_tokens
 
 
-def update_token_predictions(
-    db_session: Session, mint_address: str, df: pd.DataFrame, is_pre_peak: bool
-):
+def get_token_counts(conn: Connection) -> Tuple[int, int, int]:
+    """
+    Count tokens by the prediction stored on their most recent record.
+
+    Args:
+        conn: SQLAlchemy connection
+
+    Returns:
+        Tuple of (total_tokens, pre_peak_count, post_peak_count)
+    """
+    latest = _latest_per_token_subquery(conn.dialect.name)
+    is_pre_peak = latest.c.is_pre_peak
+
+    total, pre_peak, post_peak = conn.execute(
+        select(
+            func.count(),
+            func.sum(case((is_pre_peak.is_(True), 1), else_=0)),
+            func.sum(case((is_pre_peak.is_(False), 1), else_=0)),
+        ).select_from(latest)
+    ).one()
+
+    return total, pre_peak or 0, post_peak or 0
+
+
+def insert_token_rows(db_session: Session, rows: List[Dict]) -> int:
+    """
+    Insert token price rows, skipping any whose id is already stored.
+
+    Uses a single INSERT ... ON CONFLICT (id) DO NOTHING, so there is no
+    separate existence check to race with concurrent inserts. The caller
+    commits.
+
+    Args:
+        db_session: SQLAlchemy session
+        rows: Column mappings for TokenData
+
+    Returns:
+        Number of rows actually inserted
+    """
+    if not rows:
+        return 0
+
+    statement: Insert
+    if db_session.get_bind().dialect.name == "postgresql":
+        statement = postgresql_insert(TokenData).on_conflict_do_nothing(
+            index_elements=["id"]
+        )
+    else:
+        statement = sqlite_insert(TokenData).on_conflict_do_nothing(
+            index_elements=["id"]
+        )
+
+    # Count the RETURNING rows, which come back from every insertmanyvalues
+    # page; rowcount only covers the last page on PostgreSQL. Runs as a Core
+    # executemany on the session's connection, outside the ORM bulk path
+    result = db_session.connection().execute(statement.returning(TokenData.id), rows)
+    return len(result.all())
+
+
+def update_token_predictions(db_session: Session, mint_address: str, is_pre_peak: bool):
     """
     Update token records with prediction results.
 
     Args:
         db_session: SQLAlchemy session
         mint_address: Token mint address
-        df: DataFrame with processed data
         is_pre_peak: Prediction result
     """
     logger.info(f"Updating predictions for token {mint_address}")
 
     try:
-        # Begin a transaction
-        for idx, row in df.iterrows():
-            date_obj = (
-                row["date"].date()
-                if isinstance(row["date"], pd.Timestamp)
-                else row["date"]
-            )
+        # The prediction applies to every stored day of the token
+        db_session.query(TokenData).filter(
+            TokenData.mint_address == mint_address
+        ).update({"is_pre_peak": bool(is_pre_peak)}, synchronize_session=False)
 
-            # Find the token record
-            db_record = (
-                db_session.query(TokenData)
-                .filter(
-                    TokenData.mint_address == mint_address, TokenData.date == date_obj
-                )
-                .first()
-            )
-
-            # Update record if found
-            if db_record:
-                setattr(db_record, "is_pre_peak", is_pre_peak)
-
-        # Commit all updates
         db_session.commit()
         logger.info(f"Successfully updated {mint_address} predictions")
 
@@ -103,3 +178,49 @@ def update_token_predictions(
         db_session.rollback()
         logger.error(f"Failed to update predictions: {str(e)}")
         # Don't raise the exception as this is a background task
+
+
+def update_daily_predictions(
+    db_session: Session, mint_address: str, labels: Dict[date, bool]
+):
+    """
+    Update token records with a separate prediction for each day.
+
+    All days are written with one executemany UPDATE, however many of the
+    labels differ.
+
+    Args:
+        db_session: SQLAlchemy session
+        mint_address: Token mint address
+        labels: Prediction result keyed by the day it applies to
+    """
+    logger.info(f"Updating daily predictions for token {mint_address}")
+
+    statement = (
+        update(TokenData)
+        .where(
+            and_(
+                TokenData.mint_address == bindparam("m"),
+                TokenData.date == bindparam("d"),
+            )
+        )
+        .values(is_pre_peak=bindparam("v"))
+    )
+    params = [
+        {"m": mint_address, "d": day, "v": bool(is_pre_peak)}
+        for day, is_pre_peak in labels.items()
+    ]
+
+    try:
+        if params:
+            # Core executemany; the ORM would treat a parameter list as a bulk
+            # UPDATE by primary key
+            db_session.connection().execute(statement, params)
+        db_session.commit()
+        logger.info(f"Successfully updated {len(params)} days for {mint_address}")
+
+    except Exception as e:
+        # Rollback on error
+        db_session.rollback()
+        logger.error(f"Failed to update daily predictions: {str(e)}")
+        # Don't raise the exception as this is a background task
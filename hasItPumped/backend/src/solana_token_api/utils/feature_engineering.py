@@ -3,15 +3,17 @@ Feature engineering utilities for token analysis.
 """
 
 import logging
+from typing import Dict, List, Optional
 
 import numpy as np
-import pandas as pd
+
+from solana_token_api.utils.feature_kernels import compute_features
 
 logger = logging.getLogger("api.feature_engineering")
 
 
-# Features required by the model
-features = [
+# Features required by the model, in the column order of engineer_features
+features = (
     "price_change",
     "volatility",
     "rolling_mean",
@@ -24,96 +26,107 @@ features = [
     "lag_volume_1",
     "sma7_minus_sma21",
     "ret_21d",
-]
+)
+
+# Days of history the last row's features depend on (ret_21d and the
+# 21-day past max look 21 days back)
+LOOKBACK_DAYS = 22
+
+
+def column_array(token_data: List[Dict], key: str) -> np.ndarray:
+    """Collect one numeric field of the price data into a float64 array."""
+    return np.fromiter(
+        (np.nan if item[key] is None else item[key] for item in token_data),
+        dtype=np.float64,
+        count=len(token_data),
+    )
 
 
-def engineer_features(df: pd.DataFrame) -> pd.DataFrame:
+def engineer_features(
+    token_data: List[Dict],
+    last_only: bool = False,
+    earlier_days: int = 0,
+    earlier_high: Optional[float] = None,
+) -> np.ndarray:
     """
     Engineer time-aware features for token price data.
 
     Args:
-        df: DataFrame containing token price data with date, open, high, low, close, volume
+        token_data: List of dicts with ISO date, open, high, low, close, volume
+        last_only: Only compute the most recent day's features, from the
+            trailing LOOKBACK_DAYS of history
+        earlier_days: Number of stored days older than token_data, counted
+            by days_since_launch
+        earlier_high: Highest high of those older days, used by close_to_high
 
     Returns:
-        DataFrame with engineered features suitable for model input
+        Float32 matrix of shape (days, len(features)), oldest day first,
+        suitable for model input (a single row if last_only)
     """
     logger.debug("Starting feature engineering process")
-    df = df.copy()
-
-    # Make sure date is datetime
-    try:
-        df["date"] = pd.to_datetime(
-            df["date"],
-            format="mixed",
-            errors="coerce",
-            utc=True,
-        )
-    except Exception as e:
-        logger.warning(f"Error converting dates: {e}")
-        # Fallback method for older pandas versions
-        df["date"] = pd.to_datetime(df["date"], errors="coerce", utc=True)
-
-    # Drop rows with invalid dates
-    invalid_dates = df["date"].isna().sum()
-    if invalid_dates > 0:
-        logger.warning(f"Dropped {invalid_dates} rows with invalid dates")
-        df = df.dropna(subset=["date"])
-
-    # Sort by date
-    df = df.sort_values("date")
-
-    logger.debug("Calculating basic price features")
-    # Basic features using only past data
-    df["price_change"] = df["close"].pct_change()
-
-    # For a single token series, we don't need groupby
-    rolling_window = 7
-    df["volatility"] = (
-        df["price_change"].rolling(window=rolling_window, min_periods=1).std()
-    )
-    df["rolling_mean"] = (
-        df["close"].rolling(window=rolling_window, min_periods=1).mean()
-    )
-    df["rolling_volume"] = (
-        df["volume"].rolling(window=rolling_window, min_periods=1).mean()
-    )
 
-    logger.debug("Calculating technical indicators")
-    # Technical indicators
-    df["sma_7"] = df["close"].rolling(7, min_periods=1).mean()
-    df["sma_21"] = df["close"].rolling(21, min_periods=1).mean()
-    df["sma7_minus_sma21"] = df["sma_7"] - df["sma_21"]
-    df["ret_21d"] = df["close"].pct_change(21)
+    # ISO date strings sort chronologically
+    order = np.argsort([item["date"] for item in token_data], kind="stable")
+    close = column_array(token_data, "close")[order]
+    high = column_array(token_data, "high")[order]
+    volume = column_array(token_data, "volume")[order]
+    n = len(close)
+
+    # The last row only depends on the trailing window, unless a missing close
+    # there would be forward-filled from further back
+    start = 0
+    if last_only and n > LOOKBACK_DAYS:
+        if not np.isnan(close[-LOOKBACK_DAYS:]).any():
+            start = n - LOOKBACK_DAYS
+    prior_high_max = np.nan if earlier_high is None else earlier_high
+    if start:
+        prior_high_max = np.fmax(prior_high_max, np.fmax.reduce(high[:start]))
+
+    logger.debug("Calculating rolling, lagged and relative price features")
+    (
+        price_change,
+        volatility,
+        rolling_mean,
+        rolling_volume,
+        close_to_high,
+        pct_from_past_max,
+        drawdown,
+        lag_close_1,
+        lag_volume_1,
+        sma7_minus_sma21,
+        ret_21d,
+    ) = compute_features(close[start:], high[start:], volume[start:], prior_high_max)
 
     # Time features (days since first observation)
-    df["days_since_launch"] = np.arange(1, len(df) + 1)
-
-    logger.debug("Calculating lagged features")
-    # Lagged features
-    df["lag_close_1"] = df["close"].shift(1)
-    df["lag_volume_1"] = df["volume"].shift(1)
-
-    # Relative price metrics
-    df["close_to_high"] = df["close"] / df["high"].cummax()
-    df["days_since_launch"] = range(1, len(df) + 1)
-    df["past_max_21d"] = df["close"].transform(
-        lambda x: x.shift(1).rolling(21, min_periods=1).max()
-    )
-    df["pct_from_past_max"] = df["close"] / df["past_max_21d"] - 1
-
-    # drawdown vs. 1-week high
-    df["max21d"] = df["close"].rolling(21, min_periods=1).max()
-    df["drawdown"] = df["close"] / df["max21d"] - 1
+    days_since_launch = np.arange(earlier_days + start + 1, earlier_days + n + 1)
+
+    # Columns in the order of `features`
+    X = np.column_stack(
+        (
+            price_change,
+            volatility,
+            rolling_mean,
+            rolling_volume,
+            close_to_high,
+            pct_from_past_max,
+            drawdown,
+            days_since_launch,
+            lag_close_1,
+            lag_volume_1,
+            sma7_minus_sma21,
+            ret_21d,
+        )
+    ).astype(np.float32)
+    if last_only:
+        X = X[-1:]
 
     # Check for missing values
-    for feature in features:
-        missing = df[feature].isna().sum()
+    for feature, missing in zip(features, np.isnan(X).sum(axis=0)):
         if missing > 0:
             logger.warning(f"Feature '{feature}' has {missing} missing values")
 
-    # Convert to numeric and fill missing values
-    df[features] = df[features].apply(pd.to_numeric, errors="coerce")
-    df[features] = df[features].fillna(0)
+    # Fill missing values
+    np.nan_to_num(X, copy=False, nan=0.0)
 
     logger.debug("Feature engineering completed")
-    return df
+    return X
@@ -0,0 +1,160 @@
+"""
+Numba kernels for the rolling-window features used by the model.
+"""
+
+import logging
+
+import numpy as np
+from numba import njit  # type: ignore[import-untyped]
+
+logger = logging.getLogger("api.feature_kernels")
+
+
+@njit(cache=True, error_model="numpy")
+def compute_features(close, high, volume, prior_high_max):
+    """
+    Compute the rolling, lagged and relative price features in a single pass.
+
+    Rolling means keep running sums (adding the newest value and dropping
+    the oldest) and, like pandas with ``min_periods=1``, skip missing values.
+    Volatility is recomputed from its 7-day window each day instead: a
+    running sum of squares keeps the rounding error of a large spike long
+    after the spike has left the window.
+
+    Args:
+        close: Closing prices, oldest first
+        high: Daily highs, oldest first
+        volume: Daily volumes, oldest first
+        prior_high_max: Highest high before the first day (NaN if none), so a
+            trailing slice of the history reproduces close_to_high
+
+    Returns:
+        Tuple of (price_change, volatility, rolling_mean, rolling_volume,
+        close_to_high, pct_from_past_max, drawdown, lag_close_1, lag_volume_1,
+        sma7_minus_sma21, ret_21d) arrays
+    """
+    n = close.shape[0]
+    nan = np.nan
+
+    price_change = np.full(n, nan)
+    volatility = np.full(n, nan)
+    rolling_mean = np.full(n, nan)
+    rolling_volume = np.full(n, nan)
+    close_to_high = np.full(n, nan)
+    pct_from_past_max = np.full(n, nan)
+    drawdown = np.full(n, nan)
+    lag_close_1 = np.full(n, nan)
+    lag_volume_1 = np.full(n, nan)
+    sma7_minus_sma21 = np.full(n, nan)
+    ret_21d = np.full(n, nan)
+
+    # Running window state
+    close_sum7 = 0.0
+    close_cnt7 = 0
+    close_sum21 = 0.0
+    close_cnt21 = 0
+    volume_sum7 = 0.0
+    volume_cnt7 = 0
+    high_max = prior_high_max
+
+    # Returns are taken over forward-filled closes, as pandas pct_change does
+    filled = np.empty(n)
+
+    for i in range(n):
+        c = close[i]
+        v = volume[i]
+        h = high[i]
+
+        filled[i] = c if c == c or i == 0 else filled[i - 1]
+        if i > 0:
+            price_change[i] = filled[i] / filled[i - 1] - 1
+            lag_close_1[i] = close[i - 1]
+            lag_volume_1[i] = volume[i - 1]
+        if i >= 21:
+            ret_21d[i] = filled[i] / filled[i - 21] - 1
+
+        # Add the newest values to the windows
+        if c == c:
+            close_sum7 += c
+            close_cnt7 += 1
+            close_sum21 += c
+            close_cnt21 += 1
+        if v == v:
+            volume_sum7 += v
+            volume_cnt7 += 1
+
+        # Drop the values that fell out of the windows
+        if i >= 7:
+            old = close[i - 7]
+            if old == old:
+                close_sum7 -= old
+                close_cnt7 -= 1
+            old = volume[i - 7]
+            if old == old:
+                volume_sum7 -= old
+                volume_cnt7 -= 1
+        if i >= 21:
+            old = close[i - 21]
+            if old == old:
+                close_sum21 -= old
+                close_cnt21 -= 1
+
+        if close_cnt7 > 0:
+            rolling_mean[i] = close_sum7 / close_cnt7
+        if volume_cnt7 > 0:
+            rolling_volume[i] = volume_sum7 / volume_cnt7
+        if close_cnt21 > 0:
+            sma7_minus_sma21[i] = rolling_mean[i] - close_sum21 / close_cnt21
+
+        # Sample standard deviation of the last 7 price changes, taking the
+        # mean first so the squared deviations stay small
+        change_sum7 = 0.0
+        change_cnt7 = 0
+        for j in range(max(0, i - 6), i + 1):
+            if price_change[j] == price_change[j]:
+                change_sum7 += price_change[j]
+                change_cnt7 += 1
+        if change_cnt7 > 1:
+            change_mean7 = change_sum7 / change_cnt7
+            sq_dev = 0.0
+            for j in range(max(0, i - 6), i + 1):
+                if price_change[j] == price_change[j]:
+                    sq_dev += (price_change[j] - change_mean7) ** 2
+            volatility[i] = np.sqrt(sq_dev / (change_cnt7 - 1))
+
+        if h == h:
+            if not (h <= high_max):
+                high_max = h
+            close_to_high[i] = c / high_max
+
+        # Maximum close over the previous 21 days and over the 21 days to date
+        past_max = nan
+        for j in range(max(0, i - 21), i):
+            if close[j] == close[j] and not (close[j] <= past_max):
+                past_max = close[j]
+        pct_from_past_max[i] = c / past_max - 1
+        max21 = nan
+        for j in range(max(0, i - 20), i + 1):
+            if close[j] == close[j] and not (close[j] <= max21):
+                max21 = close[j]
+        drawdown[i] = c / max21 - 1
+
+    return (
+        price_change,
+        volatility,
+        rolling_mean,
+        rolling_volume,
+        close_to_high,
+        pct_from_past_max,
+        drawdown,
+        lag_close_1,
+        lag_volume_1,
+        sma7_minus_sma21,
+        ret_21d,
+    )
+
+
+# Compile (or load from cache) at import so the first request doesn't pay for it
+_warmup = np.linspace(1.0, 2.0, 30)
+compute_features(_warmup, _warmup, _warmup, np.nan)
+logger.debug("Feature kernels compiled")
@@ -2,7 +2,6 @@
 Logging configuration for the application.
 """
 
-import json
 import logging
 import os
 import sys
@@ -10,11 +9,38 @@ from datetime import UTC, datetime
 from logging.handlers import RotatingFileHandler
 from pathlib import Path
 
+import orjson
+
 # Create logs directory if it doesn't exist
 log_dir = Path("logs")
 log_dir.mkdir(exist_ok=True)
 
 
+# Standard LogRecord attributes that aren't copied into the JSON output
+EXCLUDED_ATTRIBUTES = frozenset(
+    {
+        "args",
+        "exc_info",
+        "exc_text",
+        "levelname",
+        "levelno",
+        "lineno",
+        "message",
+        "module",
+        "msecs",
+        "msg",
+        "name",
+        "pathname",
+        "process",
+        "processName",
+        "relativeCreated",
+        "stack_info",
+        "thread",
+        "threadName",
+    }
+)
+
+
 class JsonFormatter(logging.Formatter):
     """
     Custom formatter to output logs in JSON format
@@ -22,7 +48,8 @@ class JsonFormatter(logging.Formatter):
 
     def format(self, record):
         log_record = {
-            "timestamp": datetime.now(UTC).isoformat(),
+            # The record already carries its creation time
+            "timestamp": datetime.fromtimestamp(record.created, UTC).isoformat(),
             "level": record.levelname,
             "name": record.name,
             "message": record.getMessage(),
@@ -35,29 +62,10 @@ class JsonFormatter(logging.Formatter):
 
         # Add extra attributes from record
         for key, value in record.__dict__.items():
-            if key not in [
-                "args",
-                "exc_info",
-                "exc_text",
-                "levelname",
-                "levelno",
-                "lineno",
-                "message",
-                "module",
-                "msecs",
-                "msg",
-                "name",
-                "pathname",
-                "process",
-                "processName",
-                "relativeCreated",
-                "stack_info",
-                "thread",
-                "threadName",
-            ]:
+            if key not in EXCLUDED_ATTRIBUTES:
                 log_record[key] = value
 
-        return json.dumps(log_record)
+        return orjson.dumps(log_record, default=str).decode()
 
 
 def setup_logger(name, level=None):
@@ -4,26 +4,34 @@ Utilities for model loading and prediction.
 
 import logging
 import os
+from functools import lru_cache
 from pathlib import Path
-from typing import Tuple
+from typing import Callable, Optional, Tuple
 
-import pandas as pd
+import numpy as np
 import xgboost as xgb
 from fastapi import HTTPException
 
-from solana_token_api.utils.feature_engineering import features
+from solana_token_api.utils.prediction_batcher import PredictionBatcher
 
 logger = logging.getLogger("api.model_utils")
 
+assets_dir = Path(__file__).parent.parent / "assets"
 
-def load_model(
-    model_path: str = "./assets/model.ubj",
-) -> xgb.XGBClassifier:
+# Trained XGBoost model
+MODEL_PATH = assets_dir / "model.ubj"
+
+# Native build of the model, produced by running this module
+COMPILED_MODEL_PATH = assets_dir / "predictor.so"
+
+
+@lru_cache(maxsize=1)
+def load_model() -> xgb.XGBClassifier:
     """
-    Load the XGBoost model from the specified path.
+    Load the XGBoost model from the package assets.
 
-    Args:
-        model_path: Path to the saved model file
+    The model is read from disk once, with prediction pinned to a single
+    thread; later calls return the same instance.
 
     Returns:
         Loaded XGBoost model
@@ -31,8 +39,7 @@ def load_model(
     Raises:
         HTTPException: If model file is not found
     """
-    pkg_root = Path(__file__).parent.parent
-    model_path = str(pkg_root / "assets" / "model.ubj")
+    model_path = str(MODEL_PATH)
     if not os.path.exists(model_path):
         error_msg = f"Model file {model_path} not found"
         logger.error(error_msg)
@@ -41,6 +48,9 @@ def load_model(
     try:
         model = xgb.XGBClassifier()
         model.load_model(model_path)
+        # One prediction thread per process; the API scales out with uvicorn
+        # workers instead (OMP_NUM_THREADS is pinned in the package __init__)
+        model.get_booster().set_param({"nthread": 1})
         logger.info(f"Model loaded successfully from {model_path}")
         return model
     except Exception as e:
@@ -49,31 +59,95 @@ def load_model(
         raise HTTPException(status_code=500, detail=error_msg)
 
 
-def make_prediction(model: xgb.XGBClassifier, df: pd.DataFrame) -> Tuple[bool, float]:
+def compile_model(booster: xgb.Booster, libpath: Path = COMPILED_MODEL_PATH):
     """
-    Make a prediction using the loaded model.
+    Compile the model's trees to a native shared library with Treelite.
+
+    Args:
+        booster: Loaded XGBoost booster
+        libpath: Where to write the shared library
+    """
+    import tl2cgen
+    import treelite
+
+    tl2cgen.export_lib(
+        treelite.frontend.from_xgboost(booster),
+        toolchain="gcc",
+        libpath=str(libpath),
+        params={"parallel_comp": 8},
+    )
+    logger.info(f"Compiled model to {libpath}")
+
+
+def load_compiled_predictor(
+    libpath: Path = COMPILED_MODEL_PATH,
+) -> Optional[Callable[[np.ndarray], np.ndarray]]:
+    """
+    Load the natively compiled model, if it has been built.
 
     Args:
-        model: Loaded XGBoost model
-        df: DataFrame with processed features
+        libpath: Path to the shared library from compile_model
 
     Returns:
-        Tuple of (is_pre_peak, confidence)
+        Function mapping a feature matrix to class 1 probabilities, or None
+        if tl2cgen or an up-to-date library is unavailable
     """
+    try:
+        import tl2cgen
+    except ImportError:
+        logger.info("tl2cgen not installed, using XGBoost for predictions")
+        return None
 
-    # Handle missing values
-    X = df[features].fillna(0)
+    if not libpath.exists():
+        logger.info(f"Compiled model {libpath} not found, using XGBoost")
+        return None
 
-    logger.debug(f"Making prediction on {len(X)} rows of data")
+    # A library built before the model was last replaced would score with
+    # the old trees
+    if libpath.stat().st_mtime < MODEL_PATH.stat().st_mtime:
+        logger.warning(f"Compiled model {libpath} is out of date, using XGBoost")
+        return None
 
     try:
-        # Predict
-        prediction_proba = model.predict_proba(X)
+        predictor = tl2cgen.Predictor(str(libpath), nthread=1)
+    except Exception as e:
+        logger.warning(f"Failed to load compiled model, using XGBoost: {str(e)}")
+        return None
+
+    logger.info(f"Compiled model loaded from {libpath}")
+
+    def predict(X: np.ndarray) -> np.ndarray:
+        # Output is shaped (rows, targets, classes); binary gives one column
+        return predictor.predict(tl2cgen.DMatrix(X)).reshape(-1)
 
-        # Use the latest data point for final prediction
-        # Class 0 is pre_peak, class 1 is post_peak
-        is_pre_peak = prediction_proba[-1, 0] > prediction_proba[-1, 1]
-        confidence = max(prediction_proba[-1, 0], prediction_proba[-1, 1])
+    return predict
+
+
+async def make_prediction(
+    batcher: PredictionBatcher, X: np.ndarray
+) -> Optional[Tuple[bool, float]]:
+    """
+    Make a prediction using the loaded model.
+
+    Args:
+        batcher: Batcher scoring rows with the loaded model
+        X: Feature matrix from engineer_features, oldest day first
+
+    Returns:
+        Tuple of (is_pre_peak, confidence), or None if the model failed
+    """
+
+    logger.debug(f"Making prediction on the latest of {len(X)} rows of data")
+
+    try:
+        # Use the latest data point for final prediction; the binary
+        # objective gives the probability of class 1
+        p1 = await batcher.predict(X[-1])
+
+        # Class 0 is pre_peak, class 1 is post_peak; like argmax over
+        # (p0, p1), a tie goes to class 0
+        is_pre_peak = p1 <= 0.5
+        confidence = 1.0 - p1 if is_pre_peak else p1
 
         logger.info(
             f"Prediction: {'pre-peak' if is_pre_peak else 'post-peak'} with {confidence:.2f} confidence"
@@ -82,5 +156,9 @@ def make_prediction(model: xgb.XGBClassifier, df: pd.DataFrame) -> Tuple[bool, f
 
     except Exception as e:
         logger.error(f"Prediction failed: {str(e)}")
-        # Return a default prediction rather than failing the request
-        return True, 0.5  # Default to pre-peak with 0.5 confidence
+        return None
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    compile_model(load_model().get_booster())
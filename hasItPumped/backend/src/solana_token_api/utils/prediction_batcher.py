@@ -0,0 +1,88 @@
+"""
+Micro-batching of model predictions across concurrent requests.
+"""
+
+import asyncio
+import logging
+from typing import Callable, List, Optional, Set, Tuple
+
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger("api.prediction_batcher")
+
+
+class PredictionBatcher:
+    """
+    Collects feature rows from concurrent requests and scores them together.
+
+    The first row to arrive opens a batch; the batch is scored with a single
+    predict call once it holds max_batch rows or max_wait_ms has passed, and
+    each caller receives the probability for its own row. The model runs in
+    the threadpool so the event loop keeps serving requests.
+    """
+
+    def __init__(
+        self,
+        predict_batch: Callable[[np.ndarray], np.ndarray],
+        max_batch: int = 32,
+        max_wait_ms: float = 10,
+    ):
+        self.predict_batch = predict_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.pending: List[Tuple[np.ndarray, asyncio.Future]] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+        # Keep running scoring tasks referenced until they finish
+        self.tasks: Set[asyncio.Task] = set()
+
+    async def predict(self, row: np.ndarray) -> float:
+        """
+        Score one feature row.
+
+        Args:
+            row: Feature vector of a single day
+
+        Returns:
+            Probability of class 1 (post-peak)
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((row, future))
+
+        if len(self.pending) >= self.max_batch:
+            self.flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.max_wait, self.flush)
+
+        return await future
+
+    def flush(self):
+        """Start scoring every pending row."""
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+        batch, self.pending = self.pending, []
+        if not batch:
+            return
+
+        task = asyncio.get_running_loop().create_task(self.score(batch))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def score(self, batch: List[Tuple[np.ndarray, asyncio.Future]]):
+        """Score one batch off the event loop and resolve the waiting callers."""
+        logger.debug(f"Scoring batch of {len(batch)} rows")
+        try:
+            X = np.stack([row for row, _ in batch]).astype(np.float32, copy=False)
+            probabilities = await run_in_threadpool(self.predict_batch, X)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), probability in zip(batch, probabilities):
+            if not future.done():
+                future.set_result(float(probability))
@@ -4,8 +4,10 @@ Test suite for the Solana Token Analysis API endpoints.
 import os
 import sys
 from datetime import datetime, timedelta, timezone
-from unittest.mock import MagicMock, patch
+from typing import Any, Dict
+from unittest.mock import AsyncMock, MagicMock, patch
 
+import numpy as np
 import pytest
 
 # Add src directory to Python path for imports
@@ -14,57 +16,108 @@ sys.path.insert(
 )
 
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
-from solana_token_api.main import app
-from solana_token_api.models.database import Base, TokenData, get_db
+from solana_token_api.main import (
+    app,
+    load_price_history,
+    prediction_cache,
+    response_cache,
+)
+from solana_token_api.models.database import (
+    Base,
+    TokenData,
+    get_conn,
+    get_db,
+    migrate_sqlite_dates,
+)
+from solana_token_api.utils.database_utils import (
+    insert_token_rows,
+    update_daily_predictions,
+)
 
 # Create in-memory database for testing
 TEST_DB_URL = "sqlite:///:memory:"
 
+# One engine and schema for the whole run; each test works inside its own
+# transaction, which is rolled back afterwards
+engine = create_engine(
+    TEST_DB_URL, connect_args={"check_same_thread": False}, poolclass=StaticPool
+)
 
-# Setup function to create test database
-@pytest.fixture(scope="function")
-def test_db():
-    """Create an in-memory test database for each test"""
-    import logging
 
-    logger = logging.getLogger(__name__)
-    logger.debug("[FIXTURE] Setting up test_db")
+@event.listens_for(engine, "connect")
+def disable_pysqlite_transactions(dbapi_connection, connection_record):
+    """Let SQLAlchemy emit BEGIN itself so savepoints nest correctly"""
+    dbapi_connection.isolation_level = None
+
+
+@event.listens_for(engine, "begin")
+def emit_begin(conn):
+    conn.exec_driver_sql("BEGIN")
+
+
+Base.metadata.create_all(bind=engine)
+
+
+# Session factory and connection of the running test, set by test_db
+current_test: Dict[str, Any] = {}
 
-    engine = create_engine(
-        TEST_DB_URL, connect_args={"check_same_thread": False}, poolclass=StaticPool
-    )
-    logger.debug(f"[FIXTURE] Engine: {engine}")
 
-    Base.metadata.create_all(bind=engine)
-    logger.debug("[FIXTURE] Tables created")
+def override_get_db():
+    db = current_test["sessionmaker"]()
+    try:
+        yield db
+    finally:
+        db.close()
 
-    from sqlalchemy import inspect
 
-    inspector = inspect(engine)
-    logger.debug(f"[FIXTURE] Tables: {inspector.get_table_names()}")
+def override_get_conn():
+    yield current_test["connection"]
 
-    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    logger.debug("[FIXTURE] Session factory created")
 
-    def override_get_db():
-        logger.debug("[FIXTURE] Providing DB session")
-        try:
-            db = TestingSessionLocal()
-            yield db
-        finally:
-            db.close()
-            logger.debug("[FIXTURE] Closed DB session")
+# Registered once for the whole run; test_db swaps what they hand out
+app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_conn] = override_get_conn
 
-    app.dependency_overrides[get_db] = override_get_db
-    logger.debug("[FIXTURE] Overrode get_db")
+
+@pytest.fixture(scope="session", autouse=True)
+def restore_dependency_overrides():
+    """Drop the test database overrides once the run is over"""
+    yield
+    app.dependency_overrides.pop(get_db, None)
+    app.dependency_overrides.pop(get_conn, None)
+
+
+# Setup function to isolate each test's database changes
+@pytest.fixture(scope="function")
+def test_db():
+    """Run each test inside a transaction on the shared test database"""
+    connection = engine.connect()
+    transaction = connection.begin()
+
+    # Commits made by tests and the app release savepoints, leaving the
+    # outer transaction to be rolled back
+    TestingSessionLocal = sessionmaker(
+        bind=connection,
+        autoflush=False,
+        join_transaction_mode="create_savepoint",
+    )
+
+    # Cached analyses from earlier tests would bypass this database
+    prediction_cache.clear()
+    response_cache.clear()
+
+    current_test["sessionmaker"] = TestingSessionLocal
+    current_test["connection"] = connection
 
     yield TestingSessionLocal
-    Base.metadata.drop_all(bind=engine)
-    logger.debug("[FIXTURE] Dropped tables")
+
+    current_test.clear()
+    transaction.rollback()
+    connection.close()
 
 
 # Create test client
@@ -89,29 +142,50 @@ def insert_sample_data(db_session, token_data, days=5):
     """Insert sample token data into the test database"""
     today = datetime.now(timezone.utc).date()
 
-    inserted_dates = []
-    for i in range(days):
-        date = today - timedelta(days=i + 10)  # Create data for dates in the past
-        inserted_dates.append(date)
-        close_price = token_data["close"] * (1 + (i * 0.05))
-
-        db_session.add(
-            TokenData(
-                id=f"{token_data['mint_address']}_{date.isoformat()}",
-                mint_address=token_data["mint_address"],
-                date=date,
-                open=token_data["open"] * (1 + (i * 0.03)),
-                high=token_data["high"] * (1 + (i * 0.04)),
-                low=token_data["low"] * (1 + (i * 0.02)),
-                close=close_price,
-                volume=token_data["volume"] * (1 + (i * 0.1)),
-                created_at=today,
-                is_pre_peak=(i < 3),  # First 3 days pre-peak, rest post-peak
-            )
+    # Scale every price series by day index in one pass each
+    i = np.arange(days)
+    dates = [today - timedelta(days=int(k) + 10) for k in i]  # Dates in the past
+    opens = (token_data["open"] * (1 + 0.03 * i)).tolist()
+    highs = (token_data["high"] * (1 + 0.04 * i)).tolist()
+    lows = (token_data["low"] * (1 + 0.02 * i)).tolist()
+    closes = (token_data["close"] * (1 + 0.05 * i)).tolist()
+    volumes = (token_data["volume"] * (1 + 0.1 * i)).tolist()
+    is_pre_peak = (i < 3).tolist()  # First 3 days pre-peak, rest post-peak
+
+    rows = [
+        {
+            "id": f"{token_data['mint_address']}_{date.isoformat()}",
+            "mint_address": token_data["mint_address"],
+            "date": date,
+            "open": open_,
+            "high": high,
+            "low": low,
+            "close": close,
+            "volume": volume,
+            "created_at": today,
+            "is_pre_peak": pre_peak,
+        }
+        for date, open_, high, low, close, volume, pre_peak in zip(
+            dates, opens, highs, lows, closes, volumes, is_pre_peak
         )
+    ]
 
+    db_session.bulk_insert_mappings(TokenData, rows)
     db_session.commit()
-    return inserted_dates
+    return dates
+
+
+def mock_dex_trade_response(now, days=5):
+    """Build a BitQuery response with one day per row, newest first"""
+    rows = [
+        {
+            "Block": {"Timefield": (now - timedelta(days=i)).strftime("%Y-%m-%d")},
+            "Trade": {"open": 1.0, "high": 1.2, "low": 0.9, "close": 1.1 + i},
+            "volume": 1000.0,
+        }
+        for i in range(days)
+    ]
+    return {"data": {"Solana": {"DEXTradeByTokens": rows}}}
 
 
 # Test 1: Root endpoint
@@ -123,6 +197,59 @@ def test_root_endpoint():
     assert "message" in response.json()
 
 
+def test_shutdown_closes_bitquery_client():
+    """Test that the app lifespan closes the shared BitQuery client"""
+    with patch("solana_token_api.main.close_client", new_callable=AsyncMock) as close:
+        with patch("solana_token_api.main.migrate_db"), TestClient(app):
+            close.assert_not_awaited()
+    close.assert_awaited_once()
+
+
+@patch("solana_token_api.main.get_solana_dex_trade_data")
+def test_startup_migrates_legacy_string_dates(mock_get_data, test_db):
+    """Test that new days sort after days stored as ISO strings by older databases"""
+    now = datetime.now(timezone.utc)
+    mint_address = "LEGACY_HISTORY"
+    db = test_db()
+    for i in range(10, 15):
+        day = (now - timedelta(days=i)).date().isoformat()
+        db.execute(
+            text(
+                "INSERT INTO token_data (id, mint_address, date, open, high, low, "
+                "close, volume, created_at) VALUES "
+                f"('{mint_address}_{day}', '{mint_address}', '{day}', "
+                f"1.0, 1.2, 0.9, 1.1, 1000.0, '{day}')"
+            )
+        )
+    db.commit()
+    db.close()
+    mock_get_data.return_value = mock_dex_trade_response(now)
+
+    # Run the startup migration against this test's database
+    connection = current_test["connection"]
+    with patch(
+        "solana_token_api.main.migrate_db",
+        side_effect=lambda: migrate_sqlite_dates(connection),
+    ), patch("solana_token_api.main.close_client", new_callable=AsyncMock):
+        with TestClient(app) as lifespan_client:
+            first = lifespan_client.post(
+                "/analyze_token", json={"mint_address": mint_address}
+            )
+            response_cache.clear()
+            second = lifespan_client.post(
+                "/analyze_token", json={"mint_address": mint_address}
+            )
+
+    assert first.status_code == 200
+    assert second.status_code == 200
+    db = test_db()
+    newest = load_price_history(db, mint_address)[0].date
+    db.close()
+    assert newest == now.date()
+    # The fetched days are found on the second call, so nothing is re-fetched
+    assert mock_get_data.call_count == 1
+
+
 # Test 2: Stats endpoint with properly mocked database
 def test_stats_endpoint(test_db, sample_token_data):
     """Test the stats endpoint"""
@@ -144,10 +271,78 @@ def test_stats_endpoint(test_db, sample_token_data):
 
     # Check specific values
     assert data["total_tokens"] == 1
+    assert data["pre_peak_count"] == 1
+    assert data["post_peak_count"] == 0
     assert len(data["recent_tokens"]) == 1
     assert data["recent_tokens"][0]["mint_address"] == sample_token_data["mint_address"]
 
 
+def test_stats_endpoint_legacy_string_dates(test_db):
+    """Test that dates stored as ISO strings by older databases still load"""
+    db = test_db()
+    db.execute(
+        text(
+            "INSERT INTO token_data (id, mint_address, date, close, volume, "
+            "created_at, is_pre_peak) VALUES "
+            "('LEGACY_2024-01-05', 'LEGACY', '2024-01-05', 1.1, 1000.0, "
+            "'2024-01-06', 1)"
+        )
+    )
+    db.commit()
+    db.close()
+
+    response = client.get("/stats")
+    assert response.status_code == 200
+    token = response.json()["recent_tokens"][0]
+    assert token["mint_address"] == "LEGACY"
+    assert token["last_updated"] == "2024-01-06"
+
+
+def test_insert_token_rows_counts_every_page(test_db, sample_token_data):
+    """Test that the inserted count spans multi-page inserts and skips conflicts"""
+    db = test_db()
+    stored = insert_sample_data(db, sample_token_data, days=5)
+
+    mint_address = sample_token_data["mint_address"]
+    today = datetime.now(timezone.utc).date()
+    days = [today - timedelta(days=i) for i in range(2500)]
+    rows = [
+        {
+            "id": f"{mint_address}_{day.isoformat()}",
+            "mint_address": mint_address,
+            "date": day,
+            "close": 1.0,
+            "created_at": today,
+        }
+        for day in days
+    ]
+
+    inserted = insert_token_rows(db, rows)
+    db.commit()
+    db.close()
+
+    # Every generated day except the sample days already stored
+    assert inserted == len(set(days) - set(stored))
+
+
+def test_update_daily_predictions(test_db, sample_token_data):
+    """Test that each stored day gets its own prediction label"""
+    db = test_db()
+    dates = insert_sample_data(db, sample_token_data, days=5)
+
+    # Flip every stored label, so the executemany carries mixed values
+    labels = {day: i >= 3 for i, day in enumerate(dates)}
+    update_daily_predictions(db, sample_token_data["mint_address"], labels)
+
+    stored = dict(
+        db.query(TokenData.date, TokenData.is_pre_peak)
+        .filter(TokenData.mint_address == sample_token_data["mint_address"])
+        .all()
+    )
+    db.close()
+    assert stored == labels
+
+
 # Test 3: Analyze token endpoint with mocked data fetcher and DB data
 @patch("solana_token_api.main.get_solana_dex_trade_data")
 def test_analyze_token_success(mock_get_data, test_db, sample_token_data):
@@ -199,13 +394,13 @@ def test_analyze_token_success(mock_get_data, test_db, sample_token_data):
 @patch("solana_token_api.main.get_solana_dex_trade_data")
 def test_analyze_token_api_only(mock_get_data, test_db):
     """Test token analysis with only API data (no DB data)"""
-    from datetime import datetime, timedelta, timezone
+    now = datetime.now(timezone.utc)
 
     # Create unique mint address
-    unique_token = f"API_ONLY_TOKEN_{datetime.now().isoformat()}"
+    unique_token = f"API_ONLY_TOKEN_{now.isoformat()}"
 
     # Mock API response
-    mock_dates = [datetime.now(timezone.utc) - timedelta(days=i) for i in range(5)]
+    mock_dates = [now - timedelta(days=i) for i in range(5)]
     mock_data = [
         {
             "Block": {"Timefield": date.strftime("%Y-%m-%dT%H:%M:%S")},
@@ -232,6 +427,98 @@ def test_analyze_token_api_only(mock_get_data, test_db):
     assert len(data["data"]) >= 5
 
 
+@patch("solana_token_api.main.get_solana_dex_trade_data")
+def test_analyze_token_cached_prediction(mock_get_data, test_db):
+    """Test that a repeat analysis with no new data reuses the prediction"""
+    from solana_token_api.main import engineer_features
+
+    now = datetime.now(timezone.utc)
+    unique_token = f"CACHE_TEST_TOKEN_{now.isoformat()}"
+    mock_get_data.return_value = mock_dex_trade_response(now)
+
+    with patch(
+        "solana_token_api.main.engineer_features", wraps=engineer_features
+    ) as spy:
+        first = client.post("/analyze_token", json={"mint_address": unique_token})
+        # Go past the response cache to reach the prediction cache
+        response_cache.clear()
+        second = client.post("/analyze_token", json={"mint_address": unique_token})
+
+    assert first.status_code == 200
+    assert second.status_code == 200
+    assert spy.call_count == 1
+    assert second.json()["is_pre_peak"] == first.json()["is_pre_peak"]
+    assert second.json()["confidence"] == first.json()["confidence"]
+
+
+@patch("solana_token_api.main.get_solana_dex_trade_data")
+def test_analyze_token_cached_response(mock_get_data, test_db):
+    """Test that a repeat request on the same day is served from the cache"""
+    now = datetime.now(timezone.utc)
+    unique_token = f"RESPONSE_CACHE_TOKEN_{now.isoformat()}"
+    mock_get_data.return_value = mock_dex_trade_response(now)
+
+    first = client.post("/analyze_token", json={"mint_address": unique_token})
+    second = client.post("/analyze_token", json={"mint_address": unique_token})
+
+    assert first.status_code == 200
+    assert second.status_code == 200
+    assert second.json() == first.json()
+    assert mock_get_data.call_count == 1
+
+
+@patch("solana_token_api.main.HISTORY_DAYS", 5)
+@patch("solana_token_api.main.get_solana_dex_trade_data")
+def test_analyze_token_counts_days_before_history(
+    mock_get_data, test_db, sample_token_data
+):
+    """Test that days older than the loaded history still reach the model"""
+    from solana_token_api.main import engineer_features
+
+    db = test_db()
+    insert_sample_data(db, sample_token_data, days=8)
+    db.close()
+    mock_get_data.return_value = mock_dex_trade_response(datetime.now(timezone.utc))
+
+    with patch(
+        "solana_token_api.main.engineer_features", wraps=engineer_features
+    ) as spy:
+        response = client.post(
+            "/analyze_token", json={"mint_address": sample_token_data["mint_address"]}
+        )
+
+    assert response.status_code == 200
+    # The payload keeps the 5 loaded days plus the 5 fetched ones
+    assert response.json()["days_of_data"] == 10
+    # The 3 oldest sample days, whose highest high is the oldest one's
+    assert spy.call_args.kwargs["earlier_days"] == 3
+    assert spy.call_args.kwargs["earlier_high"] == pytest.approx(
+        sample_token_data["high"] * (1 + 0.04 * 7)
+    )
+
+
+@patch("solana_token_api.main.get_solana_dex_trade_data")
+def test_analyze_token_model_failure_not_cached(mock_get_data, test_db):
+    """Test that the default answer after a model failure isn't cached"""
+    now = datetime.now(timezone.utc)
+    unique_token = f"MODEL_FAILURE_TOKEN_{now.isoformat()}"
+    mock_get_data.return_value = mock_dex_trade_response(now)
+
+    with patch(
+        "solana_token_api.main.batcher.predict",
+        side_effect=RuntimeError("model error"),
+    ) as failing_predict:
+        first = client.post("/analyze_token", json={"mint_address": unique_token})
+        second = client.post("/analyze_token", json={"mint_address": unique_token})
+
+    assert first.status_code == 200
+    assert first.json()["is_pre_peak"] is True
+    assert first.json()["confidence"] == 0.5
+    assert second.status_code == 200
+    # Neither the prediction nor the response was cached, so the model is retried
+    assert failing_predict.call_count == 2
+
+
 # Test 5: Analyze token with API error
 @patch("solana_token_api.main.get_solana_dex_trade_data")
 def test_analyze_token_api_error(mock_get_data, test_db):
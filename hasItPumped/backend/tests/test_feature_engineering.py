@@ -0,0 +1,164 @@
+"""
+Test suite for the feature engineering that builds model input.
+"""
+import os
+import sys
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd  # type: ignore[import-untyped]
+import pytest
+
+# Add src directory to Python path for imports
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+)
+
+from solana_token_api.utils.feature_engineering import (
+    LOOKBACK_DAYS,
+    engineer_features,
+    features,
+)
+
+
+def make_token_data(days, seed=0, missing=()):
+    """Build a random price history, newest first like collect_token_data"""
+    rng = np.random.default_rng(seed)
+    close = np.cumprod(1 + rng.normal(0, 0.1, days)) * 1.1
+    high = close * (1 + rng.uniform(0, 0.2, days))
+    volume = rng.uniform(100, 10_000, days)
+    start = date(2024, 1, 1)
+
+    token_data = [
+        {
+            "date": (start + timedelta(days=i)).isoformat(),
+            "open": float(close[i]),
+            "high": float(high[i]),
+            "low": float(close[i] * 0.9),
+            "close": float(close[i]),
+            "volume": float(volume[i]),
+        }
+        for i in range(days)
+    ]
+    # Blank out the given (day, field) pairs, as BitQuery gaps are stored
+    for i, key in missing:
+        token_data[i][key] = None
+    return token_data[::-1]
+
+
+def pandas_features(token_data):
+    """Reference features computed with the original pandas implementation"""
+    df = pd.DataFrame(token_data).astype(
+        {"close": float, "high": float, "volume": float}
+    )
+    df = df.sort_values("date")
+
+    # pct_change forward-fills gaps before comparing, as pandas used to
+    filled_close = df["close"].ffill()
+    df["price_change"] = filled_close.pct_change(fill_method=None)
+    df["volatility"] = df["price_change"].rolling(7, min_periods=1).std()
+    df["rolling_mean"] = df["close"].rolling(7, min_periods=1).mean()
+    df["rolling_volume"] = df["volume"].rolling(7, min_periods=1).mean()
+    df["sma7_minus_sma21"] = (
+        df["close"].rolling(7, min_periods=1).mean()
+        - df["close"].rolling(21, min_periods=1).mean()
+    )
+    df["ret_21d"] = filled_close.pct_change(21, fill_method=None)
+    df["days_since_launch"] = np.arange(1, len(df) + 1)
+    df["lag_close_1"] = df["close"].shift(1)
+    df["lag_volume_1"] = df["volume"].shift(1)
+    df["close_to_high"] = df["close"] / df["high"].cummax()
+    past_max_21d = df["close"].shift(1).rolling(21, min_periods=1).max()
+    df["pct_from_past_max"] = df["close"] / past_max_21d - 1
+    df["drawdown"] = df["close"] / df["close"].rolling(21, min_periods=1).max() - 1
+
+    return df[list(features)].fillna(0).to_numpy(dtype=np.float32)
+
+
+@pytest.mark.parametrize("days", [1, 3, 21, 60])
+def test_engineer_features_matches_pandas(days):
+    """Test the feature kernel against the pandas implementation"""
+    token_data = make_token_data(days)
+
+    X = engineer_features(token_data)
+
+    assert X.dtype == np.float32
+    assert X.shape == (days, len(features))
+    np.testing.assert_allclose(X, pandas_features(token_data), rtol=1e-5, atol=1e-6)
+
+
+def test_engineer_features_matches_pandas_with_gaps():
+    """Test that missing prices are handled like pandas handles NaN"""
+    missing = [
+        (3, "close"),
+        (4, "close"),
+        (10, "high"),
+        (11, "volume"),
+        (30, "close"),
+        (30, "high"),
+    ]
+    token_data = make_token_data(45, seed=1, missing=missing)
+
+    X = engineer_features(token_data)
+
+    assert not np.isnan(X).any()
+    np.testing.assert_allclose(X, pandas_features(token_data), rtol=1e-5, atol=1e-6)
+
+
+@pytest.mark.parametrize(
+    "missing",
+    [
+        [],
+        # Gaps before the trailing window
+        [(2, "close"), (5, "high"), (8, "volume")],
+        # A close missing inside the trailing window falls back to a full run
+        [(55, "close")],
+    ],
+)
+def test_engineer_features_last_only_matches_full_run(missing):
+    """Test that last_only gives the last row of the full computation"""
+    days = 60
+    assert days > LOOKBACK_DAYS
+    token_data = make_token_data(days, seed=2, missing=missing)
+    # Put the all-time high before the trailing window (data is newest first)
+    token_data[-7]["high"] = 100.0
+
+    last = engineer_features(token_data, last_only=True)
+
+    assert last.shape == (1, len(features))
+    np.testing.assert_array_equal(last, engineer_features(token_data)[-1:])
+
+
+def test_engineer_features_earlier_history_matches_full_run():
+    """Test that a truncated history plus its earlier summary gives the last row"""
+    token_data = make_token_data(60, seed=3, missing=[(50, "close")])
+    # Put the all-time high in the days left out of the loaded window
+    token_data[-5]["high"] = 100.0
+    loaded, earlier = token_data[:30], token_data[30:]
+
+    last = engineer_features(
+        loaded,
+        last_only=True,
+        earlier_days=len(earlier),
+        earlier_high=max(item["high"] for item in earlier),
+    )
+
+    np.testing.assert_array_equal(last, engineer_features(token_data)[-1:])
+
+
+def test_volatility_recovers_after_price_spike():
+    """Test that volatility stays exact once a huge price jump leaves the window"""
+    days, spike = 120, 40
+    token_data = make_token_data(days, seed=4)[::-1]
+    # One +2.4e7 price change, as seen in the seed data
+    for item in token_data[spike:]:
+        for key in ("open", "high", "low", "close"):
+            item[key] *= 2.4e7 + 1
+
+    X = engineer_features(token_data[::-1])
+
+    close = np.array([item["close"] for item in token_data])
+    price_change = close[1:] / close[:-1] - 1
+    expected = [np.std(price_change[max(0, i - 7) : i], ddof=1) for i in range(2, days)]
+    assert X[spike, features.index("price_change")] > 1e7
+    np.testing.assert_allclose(X[2:, features.index("volatility")], expected, rtol=1e-6)
@@ -0,0 +1,72 @@
+"""
+Test suite for batching concurrent model predictions.
+"""
+import asyncio
+import os
+import sys
+
+import numpy as np
+
+# Add src directory to Python path for imports
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+)
+
+from solana_token_api.utils.prediction_batcher import PredictionBatcher
+
+
+def run_concurrently(batcher, count):
+    """Send `count` rows to the batcher at once, row i filled with i"""
+
+    async def predict_all():
+        return await asyncio.gather(
+            *(batcher.predict(np.full(3, i, dtype=np.float32)) for i in range(count)),
+            return_exceptions=True,
+        )
+
+    return asyncio.run(predict_all())
+
+
+def test_batches_split_at_max_batch():
+    """Test that concurrent rows are scored in full batches plus a timed remainder"""
+    batch_sizes = []
+
+    def predict_batch(X):
+        batch_sizes.append(len(X))
+        # A per-row value, so each caller can be matched to its own row
+        return X[:, 0] + 0.5
+
+    results = run_concurrently(PredictionBatcher(predict_batch), 100)
+
+    # Batches may finish in any order in the threadpool
+    assert sorted(batch_sizes, reverse=True) == [32, 32, 32, 4]
+    assert results == [i + 0.5 for i in range(100)]
+
+
+def test_partial_batch_flushes_after_max_wait():
+    """Test that fewer than max_batch rows are still scored, in one batch"""
+    batch_sizes = []
+
+    def predict_batch(X):
+        batch_sizes.append(len(X))
+        return X[:, 0] + 0.5
+
+    batcher = PredictionBatcher(predict_batch, max_batch=32, max_wait_ms=5)
+    results = run_concurrently(batcher, 3)
+
+    assert batch_sizes == [3]
+    assert results == [0.5, 1.5, 2.5]
+    assert batcher.pending == []
+    assert batcher.timer is None
+
+
+def test_predict_error_reaches_every_caller():
+    """Test that a failing batch raises the model's error in every waiting call"""
+    error = RuntimeError("model error")
+
+    def predict_batch(X):
+        raise error
+
+    results = run_concurrently(PredictionBatcher(predict_batch, max_batch=4), 10)
+
+    assert results == [error] * 10